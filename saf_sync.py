@@ -1,34 +1,44 @@
 #!/data/data/com.termux/files/usr/bin/python
 
-from enum import Enum
-from collections.abc import Iterator
-from typing import Optional, Tuple
+from collections import OrderedDict
+from collections.abc import Callable, Iterator
+from concurrent.futures import Executor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Final, Literal, Optional, Tuple
+import hashlib
+import queue
 import subprocess
-import json
+import threading
+import time
 import argparse
+import functools
+import logging
+import sys
 
+try:
+    from orjson import loads as json_loads
+except ImportError:
+    from json import loads as json_loads
 
-class SAFType(Enum):
-    FILE = 'FILE'
-    DIR = 'DIR'
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
 
+SAFType = Literal['FILE', 'DIR']
+SAF_FILE: Final = 'FILE'
+SAF_DIR: Final = 'DIR'
+
+
+@dataclass(slots=True, repr=False, eq=False)
 class SAFEntry:
-    name: str
     uri: str
+    name: str
     file_type: SAFType
-    parent: Optional["SAFEntry"]
-    length: Optional[int]
-    modified: Optional[int]
-
-    def __init__(self, uri: str, name: str, file_type: SAFType, parent: Optional["SAFEntry"] = None,
-                 length: Optional[int] = None, modified: Optional[int] = None) -> None:
-        self.name = name
-        self.uri = uri
-        self.file_type = file_type
-        self.parent = parent
-        self.length = length
-        self.modified = modified
+    parent: Optional["SAFEntry"] = None
+    length: Optional[int] = None
+    modified: Optional[int] = None
 
     def __repr__(self) -> str:
         return f'SAF({self.file_type} {self.name} at {self.uri})'
@@ -45,135 +55,483 @@ class SAFStat:
         self.modified = modified
 
 
-def debug(s: str) -> None:
-    print(s)
+log = logging.getLogger('saf_sync')
+
+
+_DIR_MIME: Final = 'vnd.android.document/directory'
 
 
 def map_mime_to_saf_type(mime: str) -> SAFType:
-    return SAFType.DIR if mime == 'vnd.android.document/directory' else SAFType.FILE
+    return SAF_DIR if mime == _DIR_MIME else SAF_FILE
+
+
+# How long to wait for termux-saf-ls to exit after its output fails to parse, before blaming the output itself
+LS_EXIT_GRACE_SECONDS = 1.0
 
 
 def ls(entry: SAFEntry) -> Iterator[SAFEntry]:
-    listing_str = subprocess.check_output(['termux-saf-ls', entry.uri])
-    listing_result = json.loads(listing_str)
-    for listed_entry in listing_result:
-        entry_type = map_mime_to_saf_type(listed_entry['type'])
-        yield SAFEntry(
-            uri=listed_entry['uri'],
-            name=listed_entry['name'],
-            file_type=entry_type,
-            parent=entry,
-            length=listed_entry.get("length"),
-            modified=listed_entry.get("last_modified")
-        )
+    """List a directory, yielding entries as termux-saf-ls produces them when ijson is available."""
+    command = ['termux-saf-ls', entry.uri]
+    proc = subprocess.Popen(command, stdout=subprocess.PIPE)
+    try:
+        if ijson is not None:
+            listing_result = ijson.items(proc.stdout, 'item')
+        else:
+            listing_str = proc.stdout.read()
+            if proc.wait() != 0:
+                raise subprocess.CalledProcessError(proc.returncode, command)
+            listing_result = json_loads(listing_str)
+        for listed_entry in listing_result:
+            # Inlined map_mime_to_saf_type, as this runs for every listed entry
+            yield SAFEntry(
+                listed_entry['uri'],
+                listed_entry['name'],
+                SAF_DIR if listed_entry['type'] == _DIR_MIME else SAF_FILE,
+                entry,
+                listed_entry.get("length"),
+                listed_entry.get("last_modified")
+            )
+    except Exception as e:
+        # A failing termux-saf-ls leaves truncated or empty output, so report its exit status over a parse error.
+        # If it's still running the error is genuinely ours; closing the pipe below would kill it with SIGPIPE.
+        if not isinstance(e, subprocess.CalledProcessError):
+            try:
+                exited_status = proc.wait(timeout=LS_EXIT_GRACE_SECONDS)
+            except subprocess.TimeoutExpired:
+                exited_status = 0
+            if exited_status != 0:
+                raise subprocess.CalledProcessError(exited_status, command) from e
+        raise
+    finally:
+        proc.stdout.close()
+        status = proc.wait()
+    if status != 0:
+        raise subprocess.CalledProcessError(status, command)
+
+
+LS_TTL_SECONDS = 60.0
+LS_CACHE_MAXSIZE = 256
+
+# Least recently used listing first
+_ls_cache: OrderedDict[str, Tuple[float, dict[str, SAFEntry]]] = OrderedDict()
+_ls_cache_lock = threading.Lock()
+
+
+def _cache_listing(uri: str, fetched_at: float, listing: dict[str, SAFEntry]) -> None:
+    if LS_TTL_SECONDS <= 0:
+        return
+    with _ls_cache_lock:
+        _ls_cache[uri] = (fetched_at, listing)
+        _ls_cache.move_to_end(uri)
+        now = time.monotonic()
+        while len(_ls_cache) > 0:
+            oldest_fetched_at, _ = next(iter(_ls_cache.values()))
+            if len(_ls_cache) <= LS_CACHE_MAXSIZE and now - oldest_fetched_at < LS_TTL_SECONDS:
+                break
+            _ls_cache.popitem(last=False)
+
+
+def invalidate_listing(entry: Optional[SAFEntry]) -> None:
+    if entry is None:
+        return
+    with _ls_cache_lock:
+        _ls_cache.pop(entry.uri, None)
 
 
 def ls_map(entry: SAFEntry) -> dict[str, SAFEntry]:
+    """List a directory by name, reusing a listing fetched within the last LS_TTL_SECONDS.
+
+    Up to LS_CACHE_MAXSIZE listings are kept, least recently used going first. The returned dict may be shared
+    with other callers and must not be modified.
+    """
+    with _ls_cache_lock:
+        cached = _ls_cache.get(entry.uri)
+        if cached is not None:
+            if time.monotonic() - cached[0] < LS_TTL_SECONDS:
+                _ls_cache.move_to_end(entry.uri)
+                return cached[1]
+            del _ls_cache[entry.uri]
+
+    fetched_at = time.monotonic()
     ret: dict[str, SAFEntry] = {}
     for listed_entry in ls(entry):
         ret[listed_entry.name] = listed_entry
+    _cache_listing(entry.uri, fetched_at, ret)
     return ret
 
 
+# Listings overlapped by ls_map_pair; beyond this, extra sync workers list their source directory in turn
+LS_PARALLELISM = 8
+
+_listing_pool = ThreadPoolExecutor(max_workers=LS_PARALLELISM, thread_name_prefix='saf-ls')
+
+
+def ls_map_pair(first: SAFEntry, second: SAFEntry) -> Tuple[dict[str, SAFEntry], dict[str, SAFEntry]]:
+    """List two directories at once, overlapping the two termux-saf-ls round trips.
+
+    ls_map never submits work back to _listing_pool, so waiting on it from a sync worker can't deadlock.
+    """
+    first_future = _listing_pool.submit(ls_map, first)
+    second_entries = ls_map(second)
+    return first_future.result(), second_entries
+
+
 def mkdir(parent: SAFEntry, name: str) -> SAFEntry:
-    debug(f"Making directory {name} in {parent.name}")
-    if parent.file_type != SAFType.DIR:
+    log.info("Making directory %s in %s", name, parent.name)
+    if parent.file_type != SAF_DIR:
         raise ValueError("Trying to create a directory inside a non-directory")
     uri = subprocess.check_output(['termux-saf-mkdir', parent.uri, name], text=True).strip()
-    return SAFEntry(uri, name, SAFType.DIR, parent)
+    invalidate_listing(parent)
+    # A directory we just created is known to be empty, so there's no need to spawn termux-saf-ls for it
+    _cache_listing(uri, time.monotonic(), {})
+    return SAFEntry(uri, name, SAF_DIR, parent)
 
 
-def saf_write(entry: SAFEntry, content: bytes) -> None:
-    debug(f"Writing content for {entry.name}")
-    if entry.file_type != SAFType.FILE:
-        raise ValueError("Trying to write to a non-file")
-    subprocess.run(['termux-saf-write', entry.uri], input=content, check=True)
+COPY_CHUNK_SIZE = 1 << 16
 
 
-def saf_read(entry: SAFEntry) -> bytes:
-    if entry.file_type != SAFType.FILE:
+def _start_read(entry: SAFEntry) -> subprocess.Popen:
+    if entry.file_type != SAF_FILE:
         raise ValueError("Trying to read a non-file")
-    return subprocess.check_output(['termux-saf-read', entry.uri])
-
-
-def mkfile(parent: SAFEntry, name: str, content: Optional[bytes] = None) -> SAFEntry:
-    debug(f"Making file {name} in {parent.name}")
-    if parent.file_type != SAFType.DIR:
+    return subprocess.Popen(['termux-saf-read', entry.uri], stdout=subprocess.PIPE, bufsize=COPY_CHUNK_SIZE)
+
+
+def _read_first_chunk(reader: subprocess.Popen, source: SAFEntry) -> bytes:
+    """Read the start of source, failing before anything is written if termux-saf-read fails immediately."""
+    try:
+        chunk = reader.stdout.read(COPY_CHUNK_SIZE)
+        if not chunk and reader.wait() != 0:
+            raise subprocess.CalledProcessError(reader.returncode, ['termux-saf-read', source.uri])
+    except BaseException:
+        reader.kill()
+        reader.stdout.close()
+        reader.wait()
+        raise
+    return chunk
+
+
+def _pipe_to(reader: subprocess.Popen, chunk: bytes, source: SAFEntry, dest: SAFEntry) -> None:
+    """Write chunk followed by the rest of reader's output into dest."""
+    broken_pipe: Optional[BrokenPipeError] = None
+    try:
+        writer = subprocess.Popen(['termux-saf-write', dest.uri], stdin=subprocess.PIPE, bufsize=COPY_CHUNK_SIZE)
+        try:
+            while chunk:
+                writer.stdin.write(chunk)
+                chunk = reader.stdout.read(COPY_CHUNK_SIZE)
+        except BrokenPipeError as e:
+            # termux-saf-write exited early; its exit status says why
+            broken_pipe = e
+        finally:
+            try:
+                writer.stdin.close()
+            except BrokenPipeError as e:
+                broken_pipe = e
+            write_status = writer.wait()
+    finally:
+        reader.stdout.close()
+        read_status = reader.wait()
+    invalidate_listing(dest.parent)
+    if write_status != 0:
+        raise subprocess.CalledProcessError(write_status, ['termux-saf-write', dest.uri])
+    if broken_pipe is not None:
+        raise broken_pipe
+    if read_status != 0:
+        raise subprocess.CalledProcessError(read_status, ['termux-saf-read', source.uri])
+
+
+def copy_file(source: SAFEntry, dest: SAFEntry) -> None:
+    """Pipe the contents of source into dest without holding the whole file in memory."""
+    log.info("Copying content of %s to %s", source.name, dest.name)
+    if dest.file_type != SAF_FILE:
+        raise ValueError("Trying to write to a non-file")
+    reader = _start_read(source)
+    _pipe_to(reader, _read_first_chunk(reader, source), source, dest)
+
+
+def create_copy(source: SAFEntry, dest_parent: SAFEntry) -> SAFEntry:
+    """Create a copy of source in dest_parent, reading source while the new file is being created.
+
+    If the transfer fails the new file is removed again, so a failed read doesn't leave an empty or truncated
+    file behind.
+    """
+    reader = _start_read(source)
+    try:
+        new_file = mkfile(dest_parent, source.name)
+    except BaseException:
+        reader.kill()
+        reader.stdout.close()
+        reader.wait()
+        raise
+    try:
+        _pipe_to(reader, _read_first_chunk(reader, source), source, new_file)
+    except BaseException:
+        try:
+            rm(new_file)
+        except subprocess.CalledProcessError:
+            log.warning("Could not remove partially copied %s", new_file.name)
+        raise
+    return new_file
+
+
+def mkfile(parent: SAFEntry, name: str) -> SAFEntry:
+    log.info("Making file %s in %s", name, parent.name)
+    if parent.file_type != SAF_DIR:
         raise ValueError("Trying to create a file inside a non-directory")
     uri = subprocess.check_output(['termux-saf-create', parent.uri, name], text=True).strip()
-    ret = SAFEntry(uri, name, SAFType.FILE, parent)
-    if content is not None:
-        saf_write(ret, content)
-    return ret
+    invalidate_listing(parent)
+    return SAFEntry(uri, name, SAF_FILE, parent)
 
 
 def stat(entry: SAFEntry) -> SAFStat:
-    if entry.file_type != SAFType.FILE:
+    if entry.file_type != SAF_FILE:
         raise ValueError("Stat is intended for files, not directories here")
     stat_str = subprocess.check_output(['termux-saf-stat', entry.uri])
-    stat_result = json.loads(stat_str)
+    stat_result = json_loads(stat_str)
 
     result_type = map_mime_to_saf_type(stat_result['type'])
     return SAFStat(result_type, stat_result['length'], stat_result.get('last_modified'))
 
 
 def rm(entry: SAFEntry) -> None:
-    debug(f"Removing {entry.name}")
+    log.info("Removing %s", entry.name)
     subprocess.check_call(['termux-saf-rm', entry.uri])
+    invalidate_listing(entry)
+    invalidate_listing(entry.parent)
+
+
+def fill_stat(entry: SAFEntry) -> None:
+    """Last-resort fallback for when a listing lacked the entry's length.
+
+    termux-saf-ls and termux-saf-stat report the same document columns, so a missing modification time alone
+    is not worth another subprocess; it just leaves needs_copy to decide by content.
+    """
+    if entry.length is not None:
+        return
+    entry_stat = stat(entry)
+    entry.length = entry_stat.length
+    if entry.modified is None:
+        entry.modified = entry_stat.modified
+
+
+def saf_sha256(entry: SAFEntry) -> bytes:
+    """Hash the contents of a file as they stream out of termux-saf-read."""
+    if entry.file_type != SAF_FILE:
+        raise ValueError("Trying to hash a non-file")
+    digest = hashlib.sha256()
+    proc = subprocess.Popen(['termux-saf-read', entry.uri], stdout=subprocess.PIPE, bufsize=COPY_CHUNK_SIZE)
+    try:
+        while chunk := proc.stdout.read(COPY_CHUNK_SIZE):
+            digest.update(chunk)
+    finally:
+        proc.stdout.close()
+        status = proc.wait()
+    if status != 0:
+        raise subprocess.CalledProcessError(status, ['termux-saf-read', entry.uri])
+    return digest.digest()
+
+
+def needs_copy(source: SAFEntry, dest: SAFEntry) -> bool:
+    """Whether dest must be overwritten with source.
+
+    Files of differing size always need copying. Same-size files are skipped if dest is at least as new,
+    and otherwise compared by content hash, which only reads from each side.
+    """
+    fill_stat(source)
+    fill_stat(dest)
+    if source.length is None or source.length != dest.length:
+        return True
+    if source.modified is not None and dest.modified is not None and source.modified <= dest.modified:
+        return False
+    return saf_sha256(source) != saf_sha256(dest)
+
+
+RM_PARALLELISM = 8
+
+# Whether termux-saf-rm accepts several URIs in one invocation; None until first tried
+_rm_accepts_many: Optional[bool] = None
+_rm_accepts_many_lock = threading.Lock()
+
+
+def _probe_rm_many(entries: list[SAFEntry]) -> list[SAFEntry]:
+    """Try removing entries with one termux-saf-rm call, returning those that are still present afterwards.
+
+    The exit status isn't trusted: a helper that ignores extra URIs, or prints usage and exits 0, would otherwise
+    silently leave entries behind. Batching is only adopted once every entry is confirmed gone.
+    """
+    global _rm_accepts_many
+    try:
+        subprocess.check_call(['termux-saf-rm', *[entry.uri for entry in entries]])
+    except subprocess.CalledProcessError:
+        pass
+    parents: dict[str, SAFEntry] = {}
+    for entry in entries:
+        invalidate_listing(entry)
+        if entry.parent is not None:
+            invalidate_listing(entry.parent)
+            parents[entry.parent.uri] = entry.parent
+    present = {uri: ls_map(parent) for uri, parent in parents.items()}
+    remaining = [entry for entry in entries if entry.parent is None or entry.name in present[entry.parent.uri]]
+    for entry in entries:
+        if entry not in remaining:
+            log.info("Removing %s", entry.name)
+    _rm_accepts_many = len(remaining) == 0
+    return remaining
+
+
+def rm_many(entries: list[SAFEntry]) -> None:
+    """Remove several entries, in a single termux-saf-rm call where the helper supports it."""
+    if len(entries) == 0:
+        return
+    if len(entries) == 1:
+        rm(entries[0])
+        return
+    probed = False
+    with _rm_accepts_many_lock:
+        if _rm_accepts_many is None:
+            entries = _probe_rm_many(entries)
+            probed = True
+        accepts_many = _rm_accepts_many
+    if accepts_many and not probed:
+        subprocess.check_call(['termux-saf-rm', *[entry.uri for entry in entries]])
+        for entry in entries:
+            invalidate_listing(entry)
+            invalidate_listing(entry.parent)
+            log.info("Removing %s", entry.name)
+        return
+    if len(entries) > 0:
+        with ThreadPoolExecutor(max_workers=RM_PARALLELISM) as ex:
+            list(ex.map(rm, entries))
 
 
 def create_dest_to_match(source: SAFEntry, dest_parent: SAFEntry) -> Optional[Tuple[SAFEntry, SAFEntry]]:
-    debug(f"Creating {source.name} in {dest_parent.name} to match")
-    if source.file_type == SAFType.DIR:
+    log.debug("Creating %s in %s to match", source.name, dest_parent.name)
+    if source.file_type == SAF_DIR:
         new_dir = mkdir(dest_parent, source.name)
         return source, new_dir
 
-    source_contents = saf_read(source)
-    mkfile(dest_parent, source.name, source_contents)
+    create_copy(source, dest_parent)
     return None
 
 
-def sync(root_source: SAFEntry, root_dest: SAFEntry) -> None:
-    process_stack: list[Tuple[SAFEntry, SAFEntry]] = [(root_source, root_dest)]
-    while len(process_stack) > 0:
-        source, dest = process_stack.pop()
-        debug(f"Syncing {source} -> {dest}")
-        if source.file_type == SAFType.DIR:
-            if dest.file_type != SAFType.DIR:
-                debug(f"Source {source.name} is dir but dest {dest.name} is not; removing and recreating")
-                rm(dest)
-                dest = mkdir(dest.parent, dest.name)
-            source_entries = ls_map(source)
-            dest_entries = ls_map(dest)
-            for entry_name in source_entries:
-                entry = source_entries[entry_name]
-                if entry_name not in dest_entries:
-                    debug(f"Newly creating {entry.name}")
-                    new_sync = create_dest_to_match(entry, dest)
-                    if new_sync is not None:
-                        process_stack.append(new_sync)
-                else:
-                    dest_entry = dest_entries[entry_name]
-                    source_type = entry.file_type
-                    dest_type = dest_entry.file_type
-                    if source_type != dest_type:
-                        rm(dest_entry)
-                        new_sync = create_dest_to_match(entry, dest)
-                        if new_sync is not None:
-                            process_stack.append(new_sync)
-                    elif source_type == SAFType.DIR:
-                        process_stack.append((entry, dest_entry))
-                    else:
-                        if entry.modified is not None and dest_entry.modified is not None and entry.length == dest_entry.length and entry.modified <= dest_entry.modified:
-                            debug(f"Skipping transfer of {entry.name} because dest file is same size and at least as new")
-                        else:
-                            contents = saf_read(entry)
-                            saf_write(dest_entry, contents)
-            for entry_name in dest_entries:
-                if entry_name in source_entries:
-                    continue
-                debug(f"{entry_name} does not exist in source; deleting")
-                rm(dest_entries[entry_name])
+def update_file(source: SAFEntry, dest: SAFEntry) -> None:
+    if not needs_copy(source, dest):
+        log.debug("Skipping transfer of %s because dest file is already up to date", source.name)
+        return
+    copy_file(source, dest)
+
+
+def _sync_dir(source: SAFEntry, dest: SAFEntry, copy_pool: Executor) -> list[Tuple[SAFEntry, SAFEntry]]:
+    """Make dest match source one level deep, returning the directory pairs still to be synced.
+
+    File transfers run on copy_pool, which is shared between all directories being synced.
+    """
+    log.debug("Syncing %s -> %s", source, dest)
+    children: list[Tuple[SAFEntry, SAFEntry]] = []
+    if source.file_type != SAF_DIR or source.uri == dest.uri:
+        return children
+    if dest.file_type != SAF_DIR:
+        log.info("Source %s is dir but dest %s is not; removing and recreating", source.name, dest.name)
+        rm(dest)
+        dest = mkdir(dest.parent, dest.name)
+    source_entries, dest_entries = ls_map_pair(source, dest)
+    source_names = source_entries.keys()
+    dest_names = dest_entries.keys()
+    # File transfers are gathered up and run concurrently once directory structure has been handled
+    transfers: list[Callable[[], object]] = []
+
+    for entry_name in source_names - dest_names:
+        entry = source_entries[entry_name]
+        log.debug("Newly creating %s", entry.name)
+        if entry.file_type == SAF_DIR:
+            children.append(create_dest_to_match(entry, dest))
+        else:
+            transfers.append(functools.partial(create_dest_to_match, entry, dest))
+
+    for entry_name in source_names & dest_names:
+        entry = source_entries[entry_name]
+        dest_entry = dest_entries[entry_name]
+        source_type = entry.file_type
+        dest_type = dest_entry.file_type
+        if source_type != dest_type:
+            rm(dest_entry)
+            if source_type == SAF_DIR:
+                children.append(create_dest_to_match(entry, dest))
+            else:
+                transfers.append(functools.partial(create_dest_to_match, entry, dest))
+        elif source_type == SAF_DIR:
+            children.append((entry, dest_entry))
+        else:
+            transfers.append(functools.partial(update_file, entry, dest_entry))
+
+    list(copy_pool.map(lambda transfer: transfer(), transfers))
+
+    to_delete = dest_names - source_names
+    if log.isEnabledFor(logging.INFO):
+        for entry_name in to_delete:
+            log.info("%s does not exist in source; deleting", entry_name)
+    rm_many([dest_entries[entry_name] for entry_name in to_delete])
+    return children
+
+
+DIR_PARALLELISM = 8
+COPY_PARALLELISM = 8
+QUEUE_DEPTH = 1024
+
+
+def sync(root_source: SAFEntry, root_dest: SAFEntry, workers: int = DIR_PARALLELISM,
+         queue_depth: int = QUEUE_DEPTH, copy_workers: int = COPY_PARALLELISM) -> None:
+    """Make root_dest match root_source.
+
+    Up to workers directories are listed and compared at once, and up to copy_workers file transfers run at once
+    across all of them. Listing a directory pair and each transfer both use two termux-saf processes, so about
+    2 * (workers + copy_workers) Termux API calls are in flight, plus up to RM_PARALLELISM per directory when
+    removing orphans one at a time.
+    """
+    if root_source.uri == root_dest.uri:
+        raise ValueError("Source and destination are the same directory")
+    if workers < 1:
+        raise ValueError("At least one worker is needed to sync")
+    if copy_workers < 1:
+        raise ValueError("At least one copy worker is needed to sync")
+    if queue_depth < 1:
+        raise ValueError("Queue depth must be at least 1; Queue treats anything lower as unbounded")
+    work_q: queue.Queue[Optional[Tuple[SAFEntry, SAFEntry]]] = queue.Queue(maxsize=queue_depth)
+    errors: list[BaseException] = []
+
+    def process(source: SAFEntry, dest: SAFEntry) -> None:
+        for child in _sync_dir(source, dest, copy_pool):
+            try:
+                work_q.put_nowait(child)
+            except queue.Full:
+                # Blocking here could deadlock with every worker waiting on a full queue, so descend inline instead
+                process(*child)
+
+    def worker() -> None:
+        while True:
+            item = work_q.get()
+            try:
+                if item is None:
+                    return
+                if len(errors) == 0:
+                    process(*item)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                work_q.task_done()
+
+    work_q.put((root_source, root_dest))
+    with ThreadPoolExecutor(max_workers=copy_workers) as copy_pool:
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        work_q.join()
+        for _ in threads:
+            work_q.put(None)
+        for thread in threads:
+            thread.join()
+    if len(errors) > 0:
+        raise errors[0]
 
 
 if __name__ == '__main__':
@@ -181,10 +539,30 @@ if __name__ == '__main__':
 
     parser.add_argument('source_uri', help='Storage Access Framework URI of source')
     parser.add_argument('dest_uri', help='Storage Access Framework URI of destination')
+    parser.add_argument('-v', '--verbose', action='count', default=0,
+                        help='Report changes made (-v), or every directory and file visited (-vv)')
+    parser.add_argument('--ls-ttl', type=float, default=LS_TTL_SECONDS,
+                        help='Seconds to reuse a directory listing before fetching it again (0 disables caching)')
+    parser.add_argument('--workers', type=int, default=DIR_PARALLELISM, help='Number of directories to sync concurrently')
+    parser.add_argument('--copy-workers', type=int, default=COPY_PARALLELISM,
+                        help='Number of files to transfer concurrently, shared across all directories being synced')
+    parser.add_argument('--queue-depth', type=int, default=QUEUE_DEPTH,
+                        help='Maximum number of directories waiting to be synced before workers descend into them directly')
 
     args = parser.parse_args()
-
-    source_saf = SAFEntry(args.source_uri, '<source_root>', SAFType.DIR)
-    dest_saf = SAFEntry(args.dest_uri, '<dest_root>', SAFType.DIR)
-
-    sync(source_saf, dest_saf)
+    if args.workers < 1:
+        parser.error('--workers must be at least 1')
+    if args.copy_workers < 1:
+        parser.error('--copy-workers must be at least 1')
+    if args.queue_depth < 1:
+        parser.error('--queue-depth must be at least 1')
+    if args.source_uri == args.dest_uri:
+        parser.error('source and destination must be different directories')
+    log_level = logging.WARNING if args.verbose == 0 else logging.INFO if args.verbose == 1 else logging.DEBUG
+    logging.basicConfig(stream=sys.stdout, format='%(message)s', level=log_level)
+    LS_TTL_SECONDS = args.ls_ttl
+
+    source_saf = SAFEntry(args.source_uri, '<source_root>', SAF_DIR)
+    dest_saf = SAFEntry(args.dest_uri, '<dest_root>', SAF_DIR)
+
+    sync(source_saf, dest_saf, workers=args.workers, queue_depth=args.queue_depth, copy_workers=args.copy_workers)